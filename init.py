@@ -1,23 +1,36 @@
 import asyncio
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import signal
 import init_functions as startup
 import os
 import time
-import psutil
+import traceback
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+# Records are formatted by the QueueHandler and written to stdout by the listener thread
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
 
 logging.basicConfig(
 	level=logging.INFO,
 	format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
 	handlers=[
-		logging.StreamHandler(sys.stdout)
+		logging.handlers.QueueHandler(log_queue)
 	]
 )
+log_listener.start()
+atexit.register(log_listener.stop)
 
 logger = logging.getLogger("main")
 
-shutdown_in_progress = False
+DOMESTIC_AI_PATH = startup.domestic_ai_path()
+
+shutdown_requested = asyncio.Event()
 
 async def initialize_services():
 	logger.info("Starting domestic-ai initialization...")
@@ -31,93 +44,138 @@ async def initialize_services():
 	logger.info("Initialization complete - system is now running")
 	return True
 
-async def forceful_kill_processes():
-	path = os.environ.get('DOMESTIC_AI_PATH', '.')
+class DomesticProcess(NamedTuple):
+	pid: int
+	pgid: Optional[int]
+	cmdline: str
+
+SCAN_CACHE_TTL = 0.5
+_scan_cache: Dict[str, Tuple[float, List[DomesticProcess]]] = {}
+
+def _scan_domestic_processes(path: str) -> List[Tuple[int, str]]:
+	# Python processes running from the domestic-ai folder, read straight from /proc where available
+	own_pid = os.getpid()
+	matches = []
+	if sys.platform.startswith('linux') and os.path.isdir('/proc'):
+		needle = path.encode()
+		for entry in os.listdir('/proc'):
+			if not entry.isdigit() or int(entry) == own_pid:
+				continue
+			try:
+				with open(f"/proc/{entry}/cmdline", 'rb') as f:
+					data = f.read()
+			except OSError:
+				continue
+			if needle not in data:
+				continue
+			executable = data.split(b'\0', 1)[0]
+			if b'python' in executable.lower():
+				matches.append((int(entry), data.replace(b'\0', b' ').decode(errors='replace').strip()))
+		return matches
+
+	import psutil
+	for proc in psutil.process_iter(attrs=['pid', 'name', 'cmdline']):
+		name = proc.info['name'] or ''
+		if 'python' not in name.lower() or proc.pid == own_pid:
+			continue
+		cmdline = ' '.join(proc.info['cmdline'] or [])
+		if path in cmdline:
+			matches.append((proc.pid, cmdline))
+	return matches
+
+def find_domestic_processes(path: str, max_age: float = SCAN_CACHE_TTL) -> List[DomesticProcess]:
+	cached = _scan_cache.get(path)
+	if cached and time.monotonic() - cached[0] < max_age:
+		return cached[1]
+
+	processes = []
+	for pid, cmdline in _scan_domestic_processes(path):
+		if os.name == 'nt':
+			processes.append(DomesticProcess(pid, None, cmdline))
+			continue
+		try:
+			processes.append(DomesticProcess(pid, os.getpgid(pid), cmdline))
+		except ProcessLookupError:
+			pass
+
+	_scan_cache[path] = (time.monotonic(), processes)
+	return processes
+
+def invalidate_process_cache():
+	_scan_cache.clear()
+
+async def wait_for_processes_exit(path: str, timeout: float, interval: float = 0.1) -> bool:
+	deadline = time.monotonic() + timeout
+	while find_domestic_processes(path, max_age=0):
+		if time.monotonic() >= deadline:
+			return False
+		await asyncio.sleep(interval)
+	return True
+
+def kill_pid(pid: int):
+	# os.kill with SIGTERM maps to TerminateProcess on Windows
+	os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+
+async def forceful_kill_processes() -> Set[int]:
 	killed = []
+	signalled_groups = set()
 	
-	logger.info(f"Forcefully killing any remaining processes under {path}")
+	logger.info(f"Forcefully killing any remaining processes under {DOMESTIC_AI_PATH}")
 	
 	try:
-		for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-			try:
-				if 'python' in proc.name().lower():
-					cmdline = proc.cmdline()
-					if cmdline and any(path in cmd for cmd in cmdline):
-						logger.info(f"Killing Python process {proc.pid}: {' '.join(cmdline[:2])}...")
-						try:
-							if os.name != 'nt':
-								os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-								logger.info(f"Killed process group for {proc.pid}")
-							else:
-								proc.kill()
-							killed.append(proc.pid)
-						except Exception as e:
-							logger.error(f"Failed to kill process {proc.pid}: {e}")
-							try:
-								proc.kill()
-								killed.append(proc.pid)
-							except Exception as e2:
-								logger.error(f"Failed to directly kill process {proc.pid}: {e2}")
-			except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-				pass
+		# A scan younger than SCAN_CACHE_TTL, such as the caller's last one, is reused
+		processes = find_domestic_processes(DOMESTIC_AI_PATH)
+		own_group = os.getpgrp() if os.name != 'nt' else None
+		pgids = {proc.pgid for proc in processes if proc.pgid is not None and proc.pgid != own_group}
+
+		for proc in processes:
+			if proc.pgid is None or proc.pgid == own_group:
+				try:
+					kill_pid(proc.pid)
+					killed.append(proc.pid)
+				except OSError as e:
+					logger.error(f"Failed to kill process {proc.pid}: {e}")
+
+		if pgids:
+			logger.info(f"Terminating process groups {sorted(pgids)}")
+			terminated = signalled_groups = startup.signal_process_groups(pgids, signal.SIGTERM)
+			survivors = await startup.wait_for_groups_exit(terminated, timeout=0.5)
+			if survivors:
+				logger.info(f"Killing process groups that ignored SIGTERM: {sorted(survivors)}")
+				startup.signal_process_groups(survivors, signal.SIGKILL)
+			killed.extend(proc.pid for proc in processes if proc.pgid in terminated)
 	except Exception as e:
 		logger.error(f"Error during forceful Python process kill: {e}")
 	
 	try:
-		if os.name != 'nt':
-			ps_cmd = f"ps aux | grep python | grep '{path}' | awk '{{print $2}}'"
-			logger.info(f"Running system command: {ps_cmd}")
-			
-			result = os.popen(ps_cmd).read().strip()
-			if result:
-				pids = result.split('\n')
-				for pid_str in pids:
-					try:
-						pid = int(pid_str)
-						os.system(f"kill -9 -{os.getpgid(pid)} 2>/dev/null")
-						logger.info(f"Killed process group for PID {pid} via system command")
-						killed.append(pid)
-					except (ValueError, ProcessLookupError) as e:
-						logger.error(f"Error killing PID {pid_str}: {e}")
-	except Exception as e:
-		logger.error(f"Error during system command kill: {e}")
-	
-	try:
-		for port in [8000, 8008, 8042]:
-			proc = startup.find_process_by_port(port)
-			if proc:
-				logger.info(f"Found process using port {port} (PID: {proc.pid}), killing it...")
-				try:
-					proc.kill()
-					killed.append(proc.pid)
-				except Exception as e:
-					logger.error(f"Error killing process on port {port}: {e}")
+		for port, proc in startup.find_processes_by_ports(startup.service_ports()).items():
+			logger.info(f"Found process using port {port} (PID: {proc.pid}), killing it...")
+			try:
+				proc.kill()
+				killed.append(proc.pid)
+			except Exception as e:
+				logger.error(f"Error killing process on port {port}: {e}")
 	except Exception as e:
 		logger.error(f"Error during port-based kill: {e}")
 	
+	invalidate_process_cache()
 	logger.info(f"Forcefully killed {len(killed)} processes: {killed}")
-	return len(killed) > 0
+	return set(killed) | signalled_groups
 
-async def verify_shutdown():
-	path = os.environ.get('DOMESTIC_AI_PATH', '.')
-	running = []
+async def verify_shutdown(signalled: Set[int] = frozenset()):
+	# Groups we launched are checked with one signal-0 each, untracked leftovers by the path scan
+	tracked = {service.pgid for service in startup.get_services() if service.pgid is not None}
+	running = [(pgid, "Tracked process group") for pgid in sorted(startup.signal_process_groups(tracked, 0))]
+	running.extend((proc.pid, proc.cmdline[:80]) for proc in find_domestic_processes(DOMESTIC_AI_PATH))
 	
-	for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-		try:
-			if 'python' in proc.name().lower():
-				cmdline = proc.cmdline()
-				if cmdline and any(path in cmd for cmd in cmdline):
-					running.append((proc.pid, ' '.join(cmdline[:2])))
-		except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-			pass
+	for port, proc in startup.find_processes_by_ports(startup.service_ports()).items():
+		running.append((proc.pid, f"Process on port {port}"))
 	
-	for port in [8000, 8008, 8042]:
-		proc = startup.find_process_by_port(port)
-		if proc:
-			try:
-				running.append((proc.pid, f"Process on port {port}"))
-			except (psutil.NoSuchProcess, psutil.AccessDenied):
-				pass
+	# Anything we already killed is just waiting to be reaped, so it doesn't warrant another pass
+	exiting = [pid for pid, _ in running if pid in signalled]
+	running = [(pid, cmd) for pid, cmd in running if pid not in signalled]
+	if exiting:
+		logger.info(f"Already killed processes still exiting: {exiting}")
 	
 	if running:
 		logger.error(f"Found {len(running)} processes still running after shutdown:")
@@ -128,79 +186,86 @@ async def verify_shutdown():
 		logger.info("All processes successfully terminated")
 		return True
 
+def write_signal_file(signal_file: Path):
+	# Write to a temp file and rename so the bot never sees a partially written signal
+	tmp_file = f"{signal_file}.tmp"
+	fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+	try:
+		os.write(fd, str(time.time()).encode())
+		os.fsync(fd)
+	finally:
+		os.close(fd)
+	os.replace(tmp_file, signal_file)
+
 async def shutdown():
-	global shutdown_in_progress
-	
-	if shutdown_in_progress:
-		logger.info("Shutdown already in progress, skipping")
-		return
-	
-	shutdown_in_progress = True
 	logger.info("Shutting down all services...")
 	
 	try:
-		signal_file = os.path.join(os.environ.get('DOMESTIC_AI_PATH', '.'), "bot_shutdown.signal")
-		with open(signal_file, 'w') as f:
-			f.write(str(time.time()))
+		write_signal_file(startup.bot_shutdown_signal())
 		
 		logger.info("Created shutdown signal file")
 		
-		await asyncio.sleep(2)
+		bot_exited = await startup.wait_for_bot_exit(timeout=2)
+		if bot_exited is None:
+			logger.info("Bot was not running")
+		elif bot_exited:
+			logger.info("Bot has exited")
+		else:
+			logger.warning("Bot did not exit within 2 seconds of the shutdown signal")
 		
 		logger.info("Stopping all services with graceful shutdown...")
 		await startup.stop_all_services()
 		
-		await asyncio.sleep(1)
+		await wait_for_processes_exit(DOMESTIC_AI_PATH, timeout=1)
 		
-		await forceful_kill_processes()
+		signalled = await forceful_kill_processes()
 		
-		if not await verify_shutdown():
+		if not await verify_shutdown(signalled):
 			logger.warning("Some processes still running, trying more aggressive shutdown...")
-			await forceful_kill_processes()
+			signalled |= await forceful_kill_processes()
 			
-			if not await verify_shutdown():
+			if not await verify_shutdown(signalled):
 				logger.error("Failed to kill all processes, some may still be running")
 		
-		if os.path.exists(signal_file):
-			try:
-				os.remove(signal_file)
-				logger.info("Removed shutdown signal file")
-			except Exception as e:
-				logger.error(f"Failed to remove signal file: {e}")
+		try:
+			startup.bot_shutdown_signal().unlink(missing_ok=True)
+			logger.info("Removed shutdown signal file")
+		except Exception as e:
+			logger.error(f"Failed to remove signal file: {e}")
 				
 	except Exception as e:
 		logger.error(f"Error during shutdown: {e}")
-		import traceback
 		logger.error(traceback.format_exc())
 		
 		try:
-			path = os.environ.get('DOMESTIC_AI_PATH', '.')
 			killed = []
-			for proc in psutil.process_iter(['pid', 'name', 'exe']):
+			for proc in find_domestic_processes(DOMESTIC_AI_PATH, max_age=0):
 				try:
-					if 'python' in proc.name().lower():
-						cmdline = proc.cmdline()
-						if cmdline and any(path in cmd for cmd in cmdline):
-							proc.kill()
-							killed.append(proc.pid)
-				except (psutil.NoSuchProcess, psutil.AccessDenied):
+					kill_pid(proc.pid)
+					killed.append(proc.pid)
+				except OSError:
 					pass
 			logger.info(f"Emergency killed {len(killed)} Python processes: {killed}")
 		except Exception as e2:
 			logger.error(f"Error during emergency kill: {e2}")
 	finally:
 		logger.info("Domestic-ai terminated")
+		log_listener.stop()
 		os._exit(0)
 
 def handle_signals():
-	loop = asyncio.get_event_loop()
+	loop = asyncio.get_running_loop()
 	
 	def signal_handler(sig_name):
 		logger.info(f"{sig_name} signal received")
-		loop.create_task(shutdown())
+		shutdown_requested.set()
 	
 	for sig, name in [(signal.SIGINT, "SIGINT"), (signal.SIGTERM, "SIGTERM")]:
-		loop.add_signal_handler(sig, lambda s=name: signal_handler(s))
+		if os.name == 'nt':
+			# add_signal_handler is not implemented on Windows event loops
+			signal.signal(sig, lambda signum, frame, s=name: loop.call_soon_threadsafe(signal_handler, s))
+		else:
+			loop.add_signal_handler(sig, lambda s=name: signal_handler(s))
 	
 	logger.info("Signal handlers registered for SIGINT and SIGTERM")
 
@@ -208,14 +273,21 @@ async def main():
 	try:
 		handle_signals()
 		
-		success = await initialize_services()
-		if not success:
+		startup_task = asyncio.create_task(initialize_services())
+		shutdown_task = asyncio.create_task(shutdown_requested.wait())
+		done, _ = await asyncio.wait({startup_task, shutdown_task}, return_when=asyncio.FIRST_COMPLETED)
+
+		if startup_task not in done:
+			logger.info("Shutdown requested during initialization")
+			startup_task.cancel()
+			return
+
+		if not startup_task.result():
 			logger.error("Initialization failed")
-			await shutdown()
+			shutdown_task.cancel()
 			return
 		
-		done = asyncio.Event()
-		await done.wait()
+		await shutdown_task
 			
 	except KeyboardInterrupt:
 		logger.info("Keyboard interrupt received in main loop")
@@ -223,7 +295,6 @@ async def main():
 		logger.info("Main task cancelled")
 	except Exception as e:
 		logger.critical(f"Unexpected error: {e}")
-		import traceback
 		logger.critical(traceback.format_exc())
 	finally:
 		await shutdown()
@@ -234,19 +305,11 @@ if __name__ == "__main__":
 	except KeyboardInterrupt:
 		print("\nKeyboard interrupt caught outside event loop, performing emergency shutdown...")
 		try:
-			path = os.environ.get('DOMESTIC_AI_PATH', '.')
-			if os.name != 'nt':
-				os.system(f"ps aux | grep python | grep '{path}' | awk '{{print $2}}' | xargs -I{{}} kill -9 {{}} 2>/dev/null")
-				print("Used system command to kill Python processes")
-			
-			for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+			for proc in find_domestic_processes(DOMESTIC_AI_PATH, max_age=0):
 				try:
-					if 'python' in proc.name().lower():
-						cmdline = proc.cmdline()
-						if cmdline and any(path in cmd for cmd in cmdline):
-							print(f"Killing Python process {proc.pid}")
-							proc.kill()
-				except (psutil.NoSuchProcess, psutil.AccessDenied):
+					print(f"Killing Python process {proc.pid}")
+					kill_pid(proc.pid)
+				except OSError:
 					pass
 			print("Emergency shutdown completed")
 		except Exception as e:
@@ -1,102 +1,262 @@
 import aiohttp
 import asyncio
+import atexit
 import dotenv
+import functools
 import logging
 import os
 import psutil
-import subprocess
+import random
 import time
 import signal
-from typing import Dict, List, Optional, Set
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
 
-dotenv.load_dotenv()
 logger = logging.getLogger('discord')
 
 STARTUP_TIMEOUT = 60
-DOMESTIC_AI_PATH = os.environ['DOMESTIC_AI_PATH']
+MAX_CONCURRENT_STARTS = 4
+STDERR_TAIL_LINES = 50
+STDERR_LINE_LIMIT = 2 ** 16
 API_HOST = "0.0.0.0"
 API_PORT = 8000
 API_ENDPOINT = "/api_endpoints"
-child_processes = set()
+
+class ChildRecord(NamedTuple):
+	pid: int
+	pgid: Optional[int]
+	name: str
+
+# Everything we spawned, keyed by pid, with enough detail to stop it without scanning the process table
+child_processes: Dict[int, ChildRecord] = {}
 bot_process = None
+_session: Optional[aiohttp.ClientSession] = None
+
+_DEVNULL_FD = os.open(os.devnull, os.O_WRONLY)
+atexit.register(os.close, _DEVNULL_FD)
+
+@functools.cache
+def domestic_ai_path() -> str:
+	# .env is only parsed the first time the path is actually needed
+	dotenv.load_dotenv()
+	return os.environ['DOMESTIC_AI_PATH']
+
+@functools.cache
+def bot_shutdown_signal() -> Path:
+	return Path(domestic_ai_path()) / "bot_shutdown.signal"
+
+async def get_session() -> aiohttp.ClientSession:
+	# Shared by every health probe.
+	# enable_cleanup_closed is left off: it only works around aborted-SSL leaks on CPython before 3.12.7/3.13.1,
+	# and every probe here is plain HTTP to a local service
+	global _session
+	if _session is None or _session.closed:
+		_session = aiohttp.ClientSession(
+			connector=aiohttp.TCPConnector(limit=16, limit_per_host=4, ttl_dns_cache=300, keepalive_timeout=75),
+			timeout=aiohttp.ClientTimeout(total=5))
+	return _session
+
+async def close_session():
+	global _session
+	if _session is not None and not _session.closed:
+		await _session.close()
+	_session = None
+
+def backoff_delay(attempt: int, base: float = 0.25, cap: float = 4.0, jitter: float = 0.5) -> float:
+	# Exponential backoff with jitter: ~0.25s, 0.5s, 1s, 2s, then 4s between probes
+	return min(cap, base * 2 ** attempt) * (1 + random.uniform(-jitter, jitter))
+
+class _ServiceProtocol(asyncio.SubprocessProtocol):
+	# Collects the stderr tail and reports exit as soon as the child is reaped, even if a grandchild still holds the pipe
+	def __init__(self, stderr_tail: deque, stderr_closed: asyncio.Event, exited: asyncio.Event):
+		self._transport = None
+		self._partial = b''
+		self._stderr_tail = stderr_tail
+		self._stderr_closed = stderr_closed
+		self._exited = exited
+
+	def connection_made(self, transport: asyncio.SubprocessTransport):
+		self._transport = transport
+
+	def pipe_data_received(self, fd: int, data: bytes):
+		*lines, partial = (self._partial + data).split(b'\n')
+		self._partial = partial[-STDERR_LINE_LIMIT:]
+		self._stderr_tail.extend(line.decode(errors='replace').rstrip() for line in lines)
+
+	def pipe_connection_lost(self, fd: int, exc: Optional[Exception]):
+		if self._partial:
+			self._stderr_tail.append(self._partial.decode(errors='replace').rstrip())
+			self._partial = b''
+		self._stderr_closed.set()
+		self._close_when_finished()
+
+	def process_exited(self):
+		self._exited.set()
+		self._close_when_finished()
+
+	def _close_when_finished(self):
+		if self._exited.is_set() and self._stderr_closed.is_set():
+			self._transport.close()
 
 class Startup:
+	# ClientTimeout is immutable, so every probe shares this instance
+	_PROBE_TIMEOUT = aiohttp.ClientTimeout(total=2)
+
 	def __init__(self, 
 				 name: str, 
 				 port: int, 
 				 host: str = "localhost", 
 				 endpoint: str = "/", 
 				 command_path: str = None,
-				 startup_timeout: int = STARTUP_TIMEOUT):
+				 startup_timeout: int = STARTUP_TIMEOUT,
+				 depends_on: List[str] = None,
+				 probe_min_delay: float = 0.05,
+				 probe_max_delay: float = 1.0):
 		self.name = name
 		self.port = port
 		self.host = host
 		self.url = f"http://{host}:{port}{endpoint}"
 		self.command_path = command_path
+		# Commands are run through bash, so only existence matters
+		self.command_exists = bool(command_path) and os.path.isfile(command_path)
 		self.startup_timeout = startup_timeout
-		self.process = None  
+		self.depends_on = depends_on or []
+		self.probe_min_delay = probe_min_delay
+		self.probe_max_delay = probe_max_delay
+		self.process: Optional[asyncio.SubprocessTransport] = None
+		self.pgid = None
+		self.exited = asyncio.Event()
+		self._stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+		self._stderr_closed = asyncio.Event()
+
+	async def _spawn(self):
+		loop = asyncio.get_running_loop()
+		tail = self._stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+		stderr_closed = self._stderr_closed = asyncio.Event()
+		exited = self.exited = asyncio.Event()
+		self.process, _ = await loop.subprocess_exec(
+			lambda: _ServiceProtocol(tail, stderr_closed, exited),
+			'bash', self.command_path,
+			stdin=None,
+			stdout=_DEVNULL_FD,
+			stderr=asyncio.subprocess.PIPE,
+			start_new_session=True)
+		pid = self.process.get_pid()
+		# start_new_session makes the child a session leader, so its pid is its process group id
+		self.pgid = pid if os.name != 'nt' else None
+		child_processes[pid] = ChildRecord(pid, self.pgid, self.name)
+
+	async def _log_stderr_tail(self):
+		try:
+			await asyncio.wait_for(self._stderr_closed.wait(), timeout=1)
+		except asyncio.TimeoutError:
+			# A grandchild still holds the pipe; once the service itself is gone there is nothing left to wait for
+			if self.exited.is_set():
+				self.process.close()
+		if self._stderr_tail:
+			logger.error(f"Last output from {self.name}:\n" + "\n".join(self._stderr_tail))
+
+	async def stop(self, timeout: float = 3) -> bool:
+		# The service runs in its own session, so its whole tree shares the recorded process group
+		if self.process is None or self.pgid is None:
+			return False
+
+		try:
+			os.killpg(self.pgid, signal.SIGTERM)
+		except ProcessLookupError:
+			child_processes.pop(self.process.get_pid(), None)
+			return True
+		except PermissionError as e:
+			logger.error(f"Failed to stop {self.name} (process group {self.pgid}): {e}")
+			return False
+		child_processes.pop(self.process.get_pid(), None)
+
+		# The leader exiting doesn't mean the rest of its group has finished cleaning up
+		if await wait_for_groups_exit({self.pgid}, timeout):
+			logger.warning(f"{self.name} did not exit within {timeout} seconds of SIGTERM, killing it")
+			signal_process_groups({self.pgid}, signal.SIGKILL)
+		logger.info(f"Stopped {self.name} (process group {self.pgid})")
+		return True
 
-	async def is_running(self, session: aiohttp.ClientSession, timeout: int = 2) -> bool:
+	async def wait_for_exit(self, timeout: float) -> bool:
+		if self.process is None:
+			return True
+		try:
+			await asyncio.wait_for(self.exited.wait(), timeout=timeout)
+			return True
+		except asyncio.TimeoutError:
+			return False
+
+	async def is_running(self, session: aiohttp.ClientSession) -> bool:
 		if self.port is None:
-			return self.process is not None and self.process.poll() is None
+			return self.process is not None and self.process.get_returncode() is None
 			
 		try:
-			async with session.get(self.url, timeout=timeout) as response:
+			async with session.get(self.url, timeout=self._PROBE_TIMEOUT) as response:
 				return response.status == 200
 		except (aiohttp.ClientError, asyncio.TimeoutError):
 			return False
 
+	async def _wait_until_ready(self):
+		attempt = 0
+		while not await self.is_running(await get_session()):
+			logger.debug(f"Waiting for {self.name} to start...")
+			await asyncio.sleep(backoff_delay(attempt, base=self.probe_min_delay, cap=self.probe_max_delay))
+			attempt += 1
+
 	async def start(self) -> bool:
 		global bot_process, child_processes
 		
 		if not self.command_path:
 			logger.warning(f"No command path specified for {self.name}, cannot start")
 			return False
+		if not self.command_exists:
+			logger.error(f"Command for {self.name} not found: {self.command_path}")
+			return False
 
 		try:
 			if self.name == "Bot":
 				logger.info(f"Starting {self.name} process with command: {self.command_path}")
-				self.process = subprocess.Popen(['bash', self.command_path], 
-											 stdout=subprocess.DEVNULL,
-											 stderr=subprocess.DEVNULL,
-											 preexec_fn=os.setsid if os.name != 'nt' else None)
+				await self._spawn()
 				
 				bot_process = self.process
-				child_processes.add(self.process.pid)
 				
-				await asyncio.sleep(1)
-				
-				if self.process.poll() is None:
-					logger.info(f"Bot started successfully (PID: {self.process.pid})")
+				# Give the bot a second to crash on startup, but report a crash the moment it happens
+				if not await self.wait_for_exit(1):
+					logger.info(f"Bot started successfully (PID: {self.process.get_pid()})")
 					return True
 				else:
-					logger.error(f"Bot process exited prematurely with code: {self.process.returncode}")
+					logger.error(f"Bot process exited prematurely with code: {self.process.get_returncode()}")
+					await self._log_stderr_tail()
 					return False
 			else:
 				try:
-					self.process = subprocess.Popen(['bash', self.command_path], 
-											   stdout=subprocess.DEVNULL,
-											   stderr=subprocess.DEVNULL,
-											   preexec_fn=os.setsid if os.name != 'nt' else None)
-					
-					child_processes.add(self.process.pid)
+					await self._spawn()
 					
-					logger.info(f"Started {self.name} process with command: {self.command_path} (PID: {self.process.pid})")
+					logger.info(f"Started {self.name} process with command: {self.command_path} (PID: {self.process.get_pid()})")
 					
-					start_time = time.time()
-					while time.time() - start_time < self.startup_timeout:
-						if self.process.poll() is not None:
-							logger.error(f"{self.name} process exited prematurely with code: {self.process.returncode}")
-							return False
-							
-						async with aiohttp.ClientSession() as session:
-							if await self.is_running(session):
-								logger.info(f"{self.name} is now running")
-								return True
-						logger.info(f"Waiting for {self.name} to start...")
-						await asyncio.sleep(2)
+					# Whichever happens first wins: the endpoint answering or the process dying
+					probe = asyncio.create_task(self._wait_until_ready())
+					exited = asyncio.create_task(self.exited.wait())
+					try:
+						done, _ = await asyncio.wait({probe, exited}, timeout=self.startup_timeout,
+													 return_when=asyncio.FIRST_COMPLETED)
+					finally:
+						probe.cancel()
+						exited.cancel()
+
+					if exited in done:
+						logger.error(f"{self.name} process exited prematurely with code: {self.process.get_returncode()}")
+						await self._log_stderr_tail()
+						return False
+					if probe in done:
+						probe.result()
+						logger.info(f"{self.name} is now running")
+						return True
 					
 					logger.error(f"{self.name} did not start within {self.startup_timeout} seconds")
+					await self._log_stderr_tail()
 					return False
 				except Exception as e:
 					logger.error(f"Failed to start {self.name}: {e}")
@@ -107,57 +267,70 @@ class Startup:
 			return False
 
 # Edit this to add or remove services
-services = [
-	Startup(
-		name="API", 
-		host=API_HOST, 
-		port=API_PORT, 
-		endpoint=API_ENDPOINT,
-		command_path=os.path.join(DOMESTIC_AI_PATH, "domestic-api", "run-api.command")
-	),
-	Startup(
-		name="Bot",
-		port=None,
-		endpoint="/", 
-		command_path=os.path.join(DOMESTIC_AI_PATH, "domestic-bot", "run-bot.command")
-	),
-	Startup(
-		name="Rembg Tool", 
-		port=8008, 
-		endpoint="/",
-		command_path=os.path.join(DOMESTIC_AI_PATH, "domestic-tools", "domestic-rembg", "run-rembg.command")
-	),
-	Startup(
-		name="Image Generation Tool", 
-		port=8042, 
-		endpoint="/queue-status",
-		command_path=os.path.join(DOMESTIC_AI_PATH, "domestic-tools", "domestic-imagen", "run-imagen.command")
-	)
-]
-
-async def ensure_service_running(service: Startup, max_attempts: int = 1) -> bool:
+@functools.cache
+def get_services() -> List[Startup]:
+	path = domestic_ai_path()
+	return [
+		Startup(
+			name="API",
+			host=API_HOST,
+			port=API_PORT,
+			endpoint=API_ENDPOINT,
+			command_path=os.path.join(path, "domestic-api", "run-api.command")
+		),
+		Startup(
+			name="Bot",
+			port=None,
+			endpoint="/",
+			command_path=os.path.join(path, "domestic-bot", "run-bot.command"),
+			depends_on=["API", "Rembg Tool", "Image Generation Tool"]
+		),
+		Startup(
+			name="Rembg Tool",
+			port=8008,
+			endpoint="/",
+			command_path=os.path.join(path, "domestic-tools", "domestic-rembg", "run-rembg.command"),
+			depends_on=["API"]
+		),
+		Startup(
+			name="Image Generation Tool",
+			port=8042,
+			endpoint="/queue-status",
+			command_path=os.path.join(path, "domestic-tools", "domestic-imagen", "run-imagen.command"),
+			depends_on=["API"]
+		)
+	]
+
+@functools.cache
+def services_by_name() -> Dict[str, Startup]:
+	return {service.name: service for service in get_services()}
+
+@functools.cache
+def service_ports() -> List[int]:
+	return [service.port for service in get_services() if service.port is not None]
+
+async def prepare_service(service: Startup, max_attempts: int = 1) -> bool:
 	global bot_process, child_processes
 
 	if service.name == "Bot":
-		if bot_process is not None and bot_process.poll() is None:
-			logger.info(f"Bot is already running (PID: {bot_process.pid})")
+		if bot_process is not None and bot_process.get_returncode() is None:
+			logger.info(f"Bot is already running (PID: {bot_process.get_pid()})")
 			return True
-			
+
 		logger.info("Bot not running, starting it...")
-		return await service.start()
+		return False
 	
 	for attempt in range(max_attempts):
-		async with aiohttp.ClientSession() as session:
-			try:
-				if await service.is_running(session):
-					logger.info(f"{service.name} is already running")
-					return True
-			except Exception as e:
-				logger.warning(f"Error checking if {service.name} is running: {e}")
+		try:
+			if await service.is_running(await get_session()):
+				logger.info(f"{service.name} is already running")
+				return True
+		except Exception as e:
+			logger.warning(f"Error checking if {service.name} is running: {e}")
 		
 		if attempt < max_attempts - 1:
 			logger.info(f"{service.name} not available (attempt {attempt+1}/{max_attempts}), waiting...")
-			await asyncio.sleep(1)
+			await asyncio.sleep(backoff_delay(attempt))
 	
 	logger.info(f"{service.name} not available after {max_attempts} attempts, trying to start it")
 	
@@ -166,55 +339,112 @@ async def ensure_service_running(service: Startup, max_attempts: int = 1) -> boo
 		if process:
 			logger.warning(f"Process already using port {service.port} (PID: {process.pid}), stopping it first")
 			try:
-				process.terminate()
-				try:
-					process.wait(timeout=5)
-				except psutil.TimeoutExpired:
-					process.kill()
+				await asyncio.to_thread(terminate_processes, [process], 5)
 			except Exception as e:
 				logger.error(f"Error stopping existing process: {e}")
 	
-	return await service.start()
+	return False
 
 async def ensure_services_running(services: List[Startup]) -> Dict[str, bool]:
-	results = {}
+	tasks = {}
+	spawn_slots = asyncio.Semaphore(MAX_CONCURRENT_STARTS)
+
+	async def ensure_after_dependencies(service: Startup) -> bool:
+		# Probing and freeing the port don't need the dependencies, so they overlap with their startup
+		if await prepare_service(service):
+			return True
+		for dependency in service.depends_on:
+			if dependency in tasks and not await tasks[dependency]:
+				logger.error(f"Not starting {service.name}: dependency {dependency} failed to start")
+				return False
+		async with spawn_slots:
+			return await service.start()
+
+	# Open the shared session up front so every concurrent probe draws from the same pool
+	await get_session()
+
+	# Services start as soon as their dependencies are up, independent ones in parallel
 	for service in services:
-		results[service.name] = await ensure_service_running(service)
+		tasks[service.name] = asyncio.create_task(ensure_after_dependencies(service))
+
+	statuses = await asyncio.gather(*tasks.values(), return_exceptions=True)
+	results = {}
+	for name, status in zip(tasks, statuses):
+		if isinstance(status, BaseException):
+			logger.error(f"Error ensuring {name} is running: {status}")
+			status = False
+		results[name] = status
 	return results
 
 def find_process_by_port(port: int) -> Optional[psutil.Process]:
+	return find_processes_by_ports([port]).get(port)
+
+def _find_processes_by_ports_per_process(wanted: Set[int]) -> Dict[int, psutil.Process]:
+	found = {}
+	for proc in psutil.process_iter():
+		try:
+			for conn in proc.net_connections(kind='inet'):
+				if conn.laddr.port in wanted and conn.laddr.port not in found:
+					found[conn.laddr.port] = proc
+		except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+			pass
+	return found
+
+def find_processes_by_ports(ports: List[int]) -> Dict[int, psutil.Process]:
+	wanted = set(ports)
+	found = {}
 	try:
-		for proc in psutil.process_iter(['pid', 'name']):
-			try:
-				connections = proc.net_connections(kind='inet')
-				for conn in connections:
-					if conn.laddr.port == port:
-						return proc
-			except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-				pass
+		for conn in psutil.net_connections(kind='inet'):
+			port = conn.laddr.port if conn.laddr else None
+			if port in wanted and port not in found and conn.pid and conn.status == psutil.CONN_LISTEN:
+				try:
+					found[port] = psutil.Process(conn.pid)
+				except psutil.NoSuchProcess:
+					pass
+	except psutil.AccessDenied:
+		# net_connections needs root on macOS, fall back to asking each process for its sockets
+		try:
+			found = _find_processes_by_ports_per_process(wanted)
+		except Exception as e:
+			logger.error(f"Error in find_processes_by_ports: {e}")
 	except Exception as e:
-		logger.error(f"Error in find_process_by_port: {e}")
-		return None
-	return None
+		logger.error(f"Error in find_processes_by_ports: {e}")
+	return found
+
+def terminate_processes(procs: List[psutil.Process], timeout: float = 3) -> List[psutil.Process]:
+	# SIGTERM everything at once, reap in one wait_procs loop, then SIGKILL whatever is left
+	signalled = []
+	for proc in procs:
+		try:
+			proc.terminate()
+			signalled.append(proc)
+		except (psutil.NoSuchProcess, psutil.ZombieProcess):
+			pass
+		except psutil.AccessDenied as e:
+			logger.warning(f"Failed to terminate PID {proc.pid}: {e}")
+
+	_, alive = psutil.wait_procs(signalled, timeout=timeout)
+	for proc in alive:
+		try:
+			logger.warning(f"PID {proc.pid} ignored SIGTERM, killing it")
+			proc.kill()
+		except (psutil.NoSuchProcess, psutil.AccessDenied):
+			pass
+	if alive:
+		psutil.wait_procs(alive, timeout=2)
+	return signalled
 
 def get_child_processes(pid: int) -> Set[int]:
 	try:
-		parent = psutil.Process(pid)
-		children = set()
-		
-		for child in parent.children(recursive=False):
-			children.add(child.pid)
-			children.update(get_child_processes(child.pid))
-			
-		return children
+		return {child.pid for child in psutil.Process(pid).children(recursive=True)}
 	except (psutil.NoSuchProcess, psutil.AccessDenied):
 		return set()
 
-def kill_process_tree(pid: int) -> bool:
+def kill_process_tree(pid: int, pgid: Optional[int] = None) -> bool:
 	try:
 		if os.name != 'nt':
 			try:
-				os.killpg(os.getpgid(pid), signal.SIGKILL)
+				os.killpg(pgid if pgid is not None else os.getpgid(pid), signal.SIGKILL)
 				logger.info(f"Killed process group for PID {pid}")
 				return True
 			except (ProcessLookupError, PermissionError) as e:
@@ -223,93 +453,92 @@ def kill_process_tree(pid: int) -> bool:
 		children = get_child_processes(pid)
 		children.add(pid)
 		
+		procs = []
 		for p_id in children:
 			try:
-				proc = psutil.Process(p_id)
-				proc.kill()
-				logger.info(f"Killed process with PID {p_id}")
-			except (psutil.NoSuchProcess, psutil.AccessDenied):
+				procs.append(psutil.Process(p_id))
+			except psutil.NoSuchProcess:
 				pass
+
+		for proc in terminate_processes(procs):
+			logger.info(f"Stopped process with PID {proc.pid}")
 				
 		return True
 	except Exception as e:
 		logger.error(f"Error killing process tree for PID {pid}: {e}")
 		return False
 
+def signal_process_groups(pgids: Set[int], sig: int) -> Set[int]:
+	signalled = set()
+	for pgid in pgids:
+		try:
+			os.killpg(pgid, sig)
+			signalled.add(pgid)
+		except ProcessLookupError:
+			pass
+		except PermissionError as e:
+			logger.error(f"Failed to signal process group {pgid}: {e}")
+	return signalled
+
+async def wait_for_groups_exit(pgids: Set[int], timeout: float, interval: float = 0.05) -> Set[int]:
+	deadline = time.monotonic() + timeout
+	survivors = signal_process_groups(pgids, 0)
+	while survivors and time.monotonic() < deadline:
+		await asyncio.sleep(interval)
+		survivors = signal_process_groups(survivors, 0)
+	return survivors
+
 async def stop_all_services() -> bool:
 	global child_processes
-	logger.info(f"Stopping all services with tracked PIDs: {child_processes}")
+	logger.info(f"Stopping all services with tracked PIDs: {sorted(child_processes)}")
+	await close_session()
 	
-	success = True
-	for pid in list(child_processes):
-		try:
-			success = kill_process_tree(pid) and success
-		except Exception as e:
-			logger.error(f"Error stopping process tree for PID {pid}: {e}")
-			success = False
+	stopped = await asyncio.gather(*(service.stop() for service in get_services() if service.pgid is not None))
+	success = all(stopped)
+
+	# kill_process_tree blocks on wait_procs, so each leftover tree is stopped on its own thread
+	records = list(child_processes.values())
+	results = await asyncio.gather(*(asyncio.to_thread(kill_process_tree, record.pid, record.pgid) for record in records),
+								   return_exceptions=True)
+	for record, result in zip(records, results):
+		if isinstance(result, BaseException):
+			logger.error(f"Error stopping process tree for {record.name} (PID {record.pid}): {result}")
+			result = False
+		else:
+			child_processes.pop(record.pid, None)
+		success = result and success
 	
-	path = DOMESTIC_AI_PATH
+	path = domestic_ai_path()
 	killed = []
+	# The launcher itself may have been started from the domestic-ai folder
+	own_pid = os.getpid()
 	try:
-		for proc in psutil.process_iter(['pid', 'cmdline']):
-			try:
-				cmdline = proc.info['cmdline']
-				if cmdline and any(path in cmd for cmd in cmdline):
-					logger.info(f"Killing untracked process: PID {proc.pid}, cmdline: {' '.join(cmdline[:2])}")
-					proc.kill()
-					killed.append(proc.pid)
-			except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-				pass
+		strays = []
+		for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+			cmdline = proc.info['cmdline'] or []
+			if proc.pid == own_pid or path not in " ".join(cmdline):
+				continue
+			kind = "Python process" if 'python' in (proc.info['name'] or '').lower() else "untracked process"
+			logger.info(f"Stopping {kind}: PID {proc.pid}, cmdline: {' '.join(cmdline[:2])}")
+			strays.append(proc)
+		if strays:
+			killed = [proc.pid for proc in await asyncio.to_thread(terminate_processes, strays)]
 	except Exception as e:
 		logger.error(f"Error during fallback process killing: {e}")
 	
-	total_killed = len(killed)
-	logger.info(f"Killed {total_killed} additional processes: {killed}")
-	
-	try:
-		for proc in psutil.process_iter(['pid', 'name', 'exe']):
-			try:
-				if 'python' in proc.name().lower():
-					try:
-						cmdline = proc.cmdline()
-						if any(path in cmd for cmd in cmdline):
-							logger.info(f"Killing Python process: PID {proc.pid}, cmdline: {' '.join(cmdline[:2])}")
-							proc.kill()
-							killed.append(proc.pid)
-					except (psutil.NoSuchProcess, psutil.AccessDenied):
-						pass
-			except (psutil.NoSuchProcess, psutil.AccessDenied):
-				pass
-	except Exception as e:
-		logger.error(f"Error killing Python processes: {e}")
-	
-	new_killed = len(killed) - total_killed
-	logger.info(f"Killed {new_killed} Python processes")
+	psutil.process_iter.cache_clear()
+	logger.info(f"Stopped {len(killed)} additional processes: {killed}")
 	
 	return success or len(killed) > 0
 
+async def wait_for_bot_exit(timeout: float) -> Optional[bool]:
+	# None means this launcher never started a bot, so there was nothing to wait for
+	bot = services_by_name()["Bot"]
+	if bot.process is None:
+		return None
+	return await bot.wait_for_exit(timeout)
+
 async def ensure_all_services():
-	results = await ensure_services_running(services)
+	results = await ensure_services_running(get_services())
 	logger.info(f"Ensured all services: {results}")
-	return all(results.values())
-
-async def verify_shutdown():
-	path = DOMESTIC_AI_PATH
-	running = []
-	
-	for proc in psutil.process_iter(['pid', 'cmdline']):
-		try:
-			cmdline = proc.cmdline()
-			if cmdline and any(path in cmd for cmd in cmdline):
-				running.append((proc.pid, ' '.join(cmdline[:2])))
-		except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-			pass
-	
-	if running:
-		logger.error(f"Found {len(running)} processes still running after shutdown:")
-		for pid, cmd in running:
-			logger.error(f"  PID {pid}: {cmd}")
-		return False
-	else:
-		logger.info("All processes successfully terminated")
-		return True
\ No newline at end of file
+	return all(results.values())
\ No newline at end of file